@@ -60,7 +60,17 @@ def init_db():
         )
     ''')
 
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS read_markers (
+            user_id INTEGER PRIMARY KEY,
+            last_notification_id INTEGER NOT NULL DEFAULT 0,
+            last_chat_id INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
     conn.commit()
     conn.close()
 
-init_db()
\ No newline at end of file
+if __name__ == '__main__':
+    init_db()
@@ -1,18 +1,19 @@
 from flask import Flask, render_template, redirect, url_for, request, session, flash, jsonify
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from jinja2 import FileSystemBytecodeCache
 from datetime import datetime
 import os
 import sqlite3
-from models import User, Post, Chat, Notification, Like, DB
+import threading
+import click
+from models import User, Post, Chat, Notification, Like, DB, unread_counter
 from config import Config
-from forms import RegistrationForm, LoginForm, ChangePasswordForm, EditProfileForm
 
 
 app = Flask(__name__, template_folder="templates")
 app.config.from_object(Config)
 app.config['SECRET_KEY'] = 'iamdwip'
-app.config['DATABASE'] = 'misfits.db'
 
 
 # Create tables if they don't exist
@@ -72,11 +73,58 @@ def create_tables():
         )
     ''')
 
+    db.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS read_markers (
+            user_id INTEGER PRIMARY KEY,
+            last_notification_id INTEGER NOT NULL DEFAULT 0,
+            last_chat_id INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
     db.commit()
     db.close()
 
 
-create_tables()
+# Attach the bytecode cache only once its directory is known to be writable
+def enable_template_cache():
+    cache_dir = app.config['TEMPLATE_CACHE_DIR']
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        return False
+    if not os.access(cache_dir, os.W_OK):
+        return False
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    return True
+
+
+_db_ready = False
+_db_ready_lock = threading.Lock()
+
+
+# Set up the schema and template cache once, on the first request rather than at import time
+@app.before_request
+def ensure_db_ready():
+    global _db_ready
+    if _db_ready:
+        return
+    with _db_ready_lock:
+        if not _db_ready:
+            create_tables()
+            if not enable_template_cache():
+                app.logger.warning("Template cache disabled: %s is not writable", app.config['TEMPLATE_CACHE_DIR'])
+            _db_ready = True
+
+
+@app.cli.command('compile-templates')
+def compile_templates():
+    """Precompile every template into the bytecode cache."""
+    if not enable_template_cache():
+        raise click.ClickException(f"{app.config['TEMPLATE_CACHE_DIR']} is not writable")
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    click.echo(f"Compiled templates into {app.config['TEMPLATE_CACHE_DIR']}")
 
 
 login_manager = LoginManager(app)
@@ -90,28 +138,6 @@ def load_user(user_id):
     db.close()
     return user
 
-# Rest of your routes and functions...
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
-
-
-@login_manager.user_loader
-def load_user(user_id):
-    return User.get_user_by_email(user_id, DB(app.config['DATABASE']))
-
-
-class DB:
-    def __init__(self, db_path):
-        self.conn = sqlite3.connect(db_path)
-        self.cursor = self.conn.cursor()
-
-    def commit(self):
-        self.conn.commit()
-
-    def close(self):
-        self.conn.close()
-
-
 @app.route('/')
 def index():
     if current_user.is_authenticated:
@@ -121,6 +147,7 @@ def index():
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
+    from forms import LoginForm
     form = LoginForm()
     if request.method == 'POST':
         email = request.form['email']
@@ -139,6 +166,7 @@ def login():
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
+    from forms import RegistrationForm
     form = RegistrationForm()
     if request.method == 'POST':
         username = request.form['username']
@@ -171,6 +199,7 @@ def chat():
     db = DB(app.config['DATABASE'])
     chats = Chat.get_chats(current_user.id, db)
     users = User.get_all_users(db)
+    unread_counter.mark_read(current_user.id, 'chats', db)
     db.close()
     return render_template('chat.html', chats=chats, users=users)
 
@@ -179,8 +208,12 @@ def chat():
 @login_required
 def send_message():
     message_content = request.form['message']
-    receiver_id = request.form['receiver_id']
+    receiver_id = request.form.get('receiver_id', type=int)
     db = DB(app.config['DATABASE'])
+    if receiver_id is None or User.get_user_by_id(receiver_id, db) is None:
+        db.close()
+        flash('Please choose a valid user to message.', 'danger')
+        return redirect(url_for('chat'))
     Chat.send_chat(current_user.id, receiver_id, message_content, db)
     db.close()
     return redirect(url_for('chat'))
@@ -204,6 +237,7 @@ def profile(user_id):
 @app.route('/edit_profile/<int:user_id>', methods=['GET', 'POST'])
 @login_required
 def edit_profile(user_id):
+    from forms import EditProfileForm
     form = EditProfileForm()
     db = DB(app.config['DATABASE'])
     user = User.get_user_by_id(user_id, db)
@@ -258,10 +292,31 @@ def notifications():
     for notification in notifications:
         post = Post.get_post(notification.post_id, db)
         notifications_with_posts.append((notification, post))
+    unread_counter.mark_read(current_user.id, 'notifications', db)
     db.close()
     return render_template('notifications.html', notifications=notifications_with_posts)
 
 
+@app.route('/unread_counts')
+@login_required
+def unread_counts():
+    counts = unread_counter.cached(current_user.id, app.config['UNREAD_CACHE_TTL'])
+    if counts is None:
+        db = DB(app.config['DATABASE'])
+        counts = unread_counter.get(current_user.id, db)
+        db.close()
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify(counts)
+    counts = unread_counter.wait(current_user.id, since, app.config['UNREAD_POLL_TIMEOUT'])
+    if counts['version'] == since:
+        # Timed out: recheck the database for changes made by other workers
+        db = DB(app.config['DATABASE'])
+        counts = unread_counter.get(current_user.id, db)
+        db.close()
+    return jsonify(counts)
+
+
 @app.route('/logout')
 @login_required
 def logout():
@@ -272,6 +327,7 @@ def logout():
 @app.route('/change_password', methods=['GET', 'POST'])
 @login_required
 def change_password():
+    from forms import ChangePasswordForm
     form = ChangePasswordForm()
     if request.method == 'POST':
         current_password = request.form['current_password']
@@ -368,4 +424,5 @@ def page_not_found(e):
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
+    ensure_db_ready()
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
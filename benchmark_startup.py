@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from config import Config
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+RUNS = int(os.environ.get('STARTUP_RUNS') or 5)
+
+
+# Time a cold import of the app in a fresh interpreter, like a new worker would
+def time_cold_start(env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import app'], cwd=BASE_DIR, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE=os.path.join(tmp, 'misfits.db'),
+                   TEMPLATE_CACHE_DIR=os.path.join(tmp, 'jinja_cache'))
+        timings = sorted(time_cold_start(env) for _ in range(RUNS))
+        side_effects = [path for path in (env['DATABASE'], env['TEMPLATE_CACHE_DIR']) if os.path.exists(path)]
+
+    median = timings[len(timings) // 2]
+    print(f"cold start over {RUNS} runs: median {median:.3f}s, max {timings[-1]:.3f}s "
+          f"(budget {Config.STARTUP_BUDGET_SECONDS:.3f}s)")
+    if side_effects:
+        raise SystemExit(f"Importing app should not touch the filesystem, but created: {', '.join(side_effects)}")
+    if median >= Config.STARTUP_BUDGET_SECONDS:
+        raise SystemExit("Cold start is over budget")
+
+
+if __name__ == '__main__':
+    main()
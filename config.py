@@ -4,5 +4,10 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'iamdwip'
-    DATABASE = os.path.join(BASE_DIR, 'misfits.db')
-    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads'
\ No newline at end of file
+    DATABASE = os.environ.get('DATABASE') or os.path.join(BASE_DIR, 'misfits.db')
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads'
+    UNREAD_POLL_TIMEOUT = float(os.environ.get('UNREAD_POLL_TIMEOUT') or 25)
+    # Unread counts are cached per process; this bounds how stale they get across workers
+    UNREAD_CACHE_TTL = float(os.environ.get('UNREAD_CACHE_TTL') or 10)
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR') or os.path.join(BASE_DIR, '.jinja_cache')
+    STARTUP_BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS') or 1.5)
\ No newline at end of file
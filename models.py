@@ -1,4 +1,7 @@
+import math
 import sqlite3
+import threading
+import time
 from datetime import datetime
 from flask_login import UserMixin
 
@@ -15,6 +18,142 @@ class DB:
         self.conn.close()
 
 
+class UnreadCounter:
+    """Per-user unread counts for notification and chat badges.
+
+    Read state lives in the read_markers table as the last notification and
+    chat id each user has seen. Counts are loaded from the database on first
+    access and reloaded once they are older than the caller's max_age; in
+    between, inserts made by this process are added in memory so badge
+    requests don't hit the database. Each user entry has its own version and
+    condition, so a change only wakes that user's long-polls.
+
+    The in-memory part is per process. With several workers, changes made in
+    another worker show up on the next reload rather than waking a parked
+    long-poll, so keep UNREAD_CACHE_TTL short when running more than one.
+    """
+    KINDS = {
+        'notifications': ('notifications', 'user_id', 'last_notification_id'),
+        'chats': ('chats', 'receiver_id', 'last_chat_id'),
+    }
+    MAX_WAIT = 60
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.tickets = 0
+
+    def _count(self, user_id, kind, db):
+        table, owner, marker = self.KINDS[kind]
+        db.cursor.execute(f"SELECT {marker} FROM read_markers WHERE user_id = ?", (user_id,))
+        row = db.cursor.fetchone()
+        last_seen = row[0] if row else 0
+        db.cursor.execute(f"SELECT COUNT(*), COALESCE(MAX(id), ?) FROM {table} WHERE {owner} = ? AND id > ?",
+                          (last_seen, user_id, last_seen))
+        return db.cursor.fetchone()
+
+    # Callers must hold self.lock
+    def _entry(self, user_id):
+        entry = self.entries.get(user_id)
+        if entry is None:
+            entry = {
+                'base': dict.fromkeys(self.KINDS, 0),
+                'through': dict.fromkeys(self.KINDS, 0),
+                'extra': {kind: set() for kind in self.KINDS},
+                'version': 0,
+                'ticket': 0,
+                'loaded_at': None,
+                'changed': threading.Condition(self.lock),
+            }
+            self.entries[user_id] = entry
+        return entry
+
+    def _snapshot(self, entry):
+        counts = {kind: entry['base'][kind] + len(entry['extra'][kind]) for kind in self.KINDS}
+        counts['version'] = entry['version']
+        return counts
+
+    def _refresh(self, user_id, db):
+        # The entry exists before the query runs so concurrent inserts land in
+        # 'extra' and survive the merge if the query didn't see them.
+        with self.lock:
+            self._entry(user_id)
+            self.tickets += 1
+            ticket = self.tickets
+        fresh = {kind: self._count(user_id, kind, db) for kind in self.KINDS}
+        with self.lock:
+            entry = self._entry(user_id)
+            # A newer reload already merged; this result is older than it
+            if ticket > entry['ticket']:
+                before = self._snapshot(entry)
+                for kind, (count, through) in fresh.items():
+                    entry['base'][kind] = count
+                    entry['through'][kind] = through
+                    entry['extra'][kind] = {row_id for row_id in entry['extra'][kind] if row_id > through}
+                entry['ticket'] = ticket
+                entry['loaded_at'] = time.monotonic()
+                if self._snapshot(entry) != before:
+                    entry['version'] += 1
+                    entry['changed'].notify_all()
+            return self._snapshot(entry)
+
+    def increment(self, user_id, kind, row_id):
+        with self.lock:
+            entry = self.entries.get(int(user_id))
+            # Users that aren't cached yet pick the row up when they're loaded
+            if entry is None or row_id <= entry['through'][kind] or row_id in entry['extra'][kind]:
+                return
+            entry['extra'][kind].add(row_id)
+            entry['version'] += 1
+            entry['changed'].notify_all()
+
+    def mark_read(self, user_id, kind, db):
+        table, owner, marker = self.KINDS[kind]
+        user_id = int(user_id)
+        db.cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table} WHERE {owner} = ?", (user_id,))
+        last_id = db.cursor.fetchone()[0]
+        db.cursor.execute("INSERT OR IGNORE INTO read_markers (user_id) VALUES (?)", (user_id,))
+        db.cursor.execute(f"UPDATE read_markers SET {marker} = MAX({marker}, ?) WHERE user_id = ?",
+                          (last_id, user_id))
+        db.commit()
+        with self.lock:
+            cached = user_id in self.entries
+        if cached:
+            self._refresh(user_id, db)
+
+    def cached(self, user_id, max_age):
+        """Return user_id's counts if they were loaded less than max_age seconds ago, else None."""
+        with self.lock:
+            entry = self.entries.get(int(user_id))
+            if entry is None or entry['loaded_at'] is None or time.monotonic() - entry['loaded_at'] > max_age:
+                return None
+            return self._snapshot(entry)
+
+    def get(self, user_id, db):
+        """Reload user_id's counts from the database and return them."""
+        return self._refresh(int(user_id), db)
+
+    def wait(self, user_id, since, timeout):
+        """Block until user_id's version differs from `since` or timeout expires.
+
+        The user must already have been loaded with get().
+        """
+        if not math.isfinite(timeout):
+            timeout = self.MAX_WAIT
+        deadline = time.monotonic() + min(max(timeout, 0), self.MAX_WAIT)
+        with self.lock:
+            entry = self.entries[int(user_id)]
+            while entry['version'] == since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                entry['changed'].wait(remaining)
+            return self._snapshot(entry)
+
+
+unread_counter = UnreadCounter()
+
+
 class User(UserMixin):
     def __init__(self, id, username, email, password, bio=None, profile_pic=None):
         self.id = id
@@ -99,7 +238,9 @@ class Chat:
         db.cursor.execute("INSERT INTO chats (sender_id, receiver_id, message) VALUES (?, ?, ?)",
                           (sender_id, receiver_id, message))
         db.commit()
-        return cls.get_chat_by_id(db.cursor.lastrowid, db)
+        chat_id = db.cursor.lastrowid
+        unread_counter.increment(receiver_id, 'chats', chat_id)
+        return cls.get_chat_by_id(chat_id, db)
 
     @classmethod
     def get_chat_by_id(cls, chat_id, db):
@@ -124,7 +265,9 @@ class Notification:
         db.cursor.execute("INSERT INTO notifications (content, user_id, post_id, notification_type) VALUES (?, ?, ?, ?)",
                           (content, user_id, post_id, notification_type))
         db.commit()
-        return cls.get_notification_by_id(db.cursor.lastrowid, db)
+        notification_id = db.cursor.lastrowid
+        unread_counter.increment(user_id, 'notifications', notification_id)
+        return cls.get_notification_by_id(notification_id, db)
 
     @classmethod
     def get_notification_by_id(cls, notification_id, db):
@@ -211,6 +354,13 @@ def create_tables(db_path):
             FOREIGN KEY (user_id) REFERENCES users (id),
             FOREIGN KEY (post_id) REFERENCES posts (id)
         );
+
+        CREATE TABLE IF NOT EXISTS read_markers (
+            user_id INTEGER PRIMARY KEY,
+            last_notification_id INTEGER NOT NULL DEFAULT 0,
+            last_chat_id INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
         """)
     db.commit()
     db.close()
@@ -43,4 +43,31 @@ document.addEventListener("DOMContentLoaded", function() {
               .catch(error => console.error('Error:', error));
         });
     });
+
+    // Keep the unread badges fresh by long-polling the counters endpoint
+    const notificationsBadge = document.getElementById('notifications-badge');
+    const chatsBadge = document.getElementById('chats-badge');
+
+    function setBadge(badge, count) {
+        badge.textContent = count > 0 ? count : '';
+    }
+
+    function pollUnread(since) {
+        const url = since === undefined ? '/unread_counts' : `/unread_counts?since=${since}`;
+        fetch(url)
+            .then(response => response.json())
+            .then(data => {
+                setBadge(notificationsBadge, data.notifications);
+                setBadge(chatsBadge, data.chats);
+                pollUnread(data.version);
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                setTimeout(() => pollUnread(since), 5000);
+            });
+    }
+
+    if (notificationsBadge && chatsBadge) {
+        pollUnread();
+    }
 });